@@ -6,9 +6,12 @@ Transcribes YouTube videos with speaker diarization
 
 import os
 import sys
-import json
 import time
-import requests
+import random
+import asyncio
+import functools
+import aiohttp
+import orjson
 from pathlib import Path
 
 # Configuration
@@ -21,52 +24,157 @@ REPO_DIR = SCRIPT_DIR.parent
 TRANSCRIPTS_DIR = REPO_DIR / "transcripts" / "assemblyai"
 PROGRESS_FILE = SCRIPT_DIR / "assemblyai_progress.json"
 
+# Polling backoff: start fast for short clips, back off for long ones
+POLLING_INITIAL = float(os.environ.get('ASSEMBLYAI_POLLING_INITIAL', '1.0'))
+POLLING_MAX = float(os.environ.get('ASSEMBLYAI_POLLING_MAX', '30.0'))
 
-def get_youtube_audio_url(youtube_id: str) -> str:
+# When set, AssemblyAI calls us back instead of us polling (run --webhook-server to receive)
+WEBHOOK_URL = os.environ.get('TRANSCRIPT_WEBHOOK_URL')
+WEBHOOK_AUTH_HEADER = os.environ.get('TRANSCRIPT_WEBHOOK_AUTH_HEADER')
+WEBHOOK_AUTH_VALUE = os.environ.get('TRANSCRIPT_WEBHOOK_AUTH_VALUE')
+
+# Serializes progress-file writes when episodes run concurrently
+PROGRESS_LOCK = asyncio.Lock()
+
+
+class TokenBucket:
+    """Caps outgoing request rate so concurrent polling can't trip AssemblyAI's
+    20,000 req / 5 min limit (~66/s)."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.tokens = burst
+        self.burst = burst
+        self.last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            await asyncio.sleep(wait)
+
+
+BUCKET = TokenBucket(rate=60, burst=120)
+
+
+def extract_youtube_id(youtube_link: str) -> str:
+    """Extract the YouTube ID from a watch / short link"""
+    youtube_link = youtube_link or ""
+    if "youtube.com/watch?v=" in youtube_link:
+        return youtube_link.split("v=")[1].split("&")[0]
+    if "youtu.be/" in youtube_link:
+        return youtube_link.split("youtu.be/")[1].split("?")[0]
+    return None
+
+
+@functools.lru_cache(maxsize=1)
+def _load_episodes(mtime: float) -> list:
+    return orjson.loads((REPO_DIR / "episodes.json").read_bytes())
+
+
+def load_episodes() -> list:
+    """Parse episodes.json once per file version (keyed by mtime)"""
+    return _load_episodes(os.path.getmtime(REPO_DIR / "episodes.json"))
+
+
+# yt-dlp is CPU-heavy on cold starts, so cap how many probes run at once
+YTDLP_SEM = asyncio.Semaphore(8)
+
+
+async def get_youtube_audio_url(youtube_id: str) -> str:
     """Get direct audio URL from YouTube video ID using yt-dlp"""
-    import subprocess
-    result = subprocess.run(
-        ['yt-dlp', '-f', 'bestaudio', '-g', f'https://youtube.com/watch?v={youtube_id}'],
-        capture_output=True, text=True
-    )
-    if result.returncode != 0:
-        raise Exception(f"Failed to get audio URL: {result.stderr}")
-    return result.stdout.strip()
+    async with YTDLP_SEM:
+        proc = await asyncio.create_subprocess_exec(
+            'yt-dlp', '-f', 'bestaudio', '-g', '--no-playlist', '--no-warnings',
+            f'https://youtube.com/watch?v={youtube_id}',
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        out, err = await proc.communicate()
+    if proc.returncode != 0:
+        raise Exception(f"Failed to get audio URL: {err.decode()}")
+    return out.decode().strip()
+
+
+# Transcription options - also part of the raw-result cache key, so a config
+# change never reuses a stale result
+TRANSCRIPT_CONFIG = {
+    "speaker_labels": True,
+    "auto_chapters": True,
+    "entity_detection": True,
+}
+
+CACHE_DIR = TRANSCRIPTS_DIR / ".cache"
+
+
+def _cache_path(youtube_id: str) -> Path:
+    """Cache file for this video under the current transcription config"""
+    import hashlib
+    canonical_cfg = orjson.dumps(TRANSCRIPT_CONFIG, option=orjson.OPT_SORT_KEYS)
+    key = hashlib.sha256(youtube_id.encode() + b"|" + canonical_cfg).hexdigest()
+    return CACHE_DIR / f"{key}.json"
 
 
-def submit_transcription(audio_url: str, speaker_labels: bool = True) -> str:
+def _store_cached_result(youtube_id: str, result: dict):
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    _cache_path(youtube_id).write_bytes(orjson.dumps(result))
+
+
+async def submit_transcription(session: aiohttp.ClientSession, audio_url: str) -> str:
     """Submit audio for transcription, returns transcript ID"""
-    data = {
-        "audio_url": audio_url,
-        "speaker_labels": speaker_labels,
-        "auto_chapters": True,
-        "entity_detection": True,
-    }
-    
-    response = requests.post(f"{BASE_URL}/transcript", json=data, headers=HEADERS)
-    response.raise_for_status()
-    return response.json()["id"]
-
-
-def poll_transcription(transcript_id: str, max_wait: int = 600) -> dict:
+    data = {"audio_url": audio_url, **TRANSCRIPT_CONFIG}
+    if WEBHOOK_URL:
+        data["webhook_url"] = WEBHOOK_URL
+        if WEBHOOK_AUTH_HEADER and WEBHOOK_AUTH_VALUE:
+            data["webhook_auth_header_name"] = WEBHOOK_AUTH_HEADER
+            data["webhook_auth_header_value"] = WEBHOOK_AUTH_VALUE
+
+    await BUCKET.acquire()
+    async with session.post(f"{BASE_URL}/transcript", json=data) as response:
+        response.raise_for_status()
+        return (await response.json())["id"]
+
+
+def transcribe_single_shot(audio_url: str) -> dict:
+    """One create-and-wait call via the assemblyai SDK - no explicit poll loop"""
+    import assemblyai as aai
+    aai.settings.api_key = ASSEMBLYAI_API_KEY
+    config = aai.TranscriptionConfig(**TRANSCRIPT_CONFIG)
+    transcript = aai.Transcriber().transcribe(audio_url, config)
+    if transcript.status == aai.TranscriptStatus.error:
+        raise Exception(f"Transcription failed: {transcript.error}")
+    return transcript.json_response
+
+
+async def poll_transcription(session: aiohttp.ClientSession, transcript_id: str, max_wait: int = 600) -> dict:
     """Poll for transcription completion"""
     polling_endpoint = f"{BASE_URL}/transcript/{transcript_id}"
-    
+
     start_time = time.time()
+    delay = POLLING_INITIAL
     while time.time() - start_time < max_wait:
-        response = requests.get(polling_endpoint, headers=HEADERS)
-        response.raise_for_status()
-        result = response.json()
-        
+        await BUCKET.acquire()
+        async with session.get(polling_endpoint) as response:
+            response.raise_for_status()
+            result = await response.json()
+
         status = result["status"]
         if status == "completed":
             return result
         elif status == "error":
             raise Exception(f"Transcription failed: {result.get('error')}")
-        
+
         print(f"  Status: {status}... waiting")
-        time.sleep(10)
-    
+        # Jitter keeps concurrent episodes from polling in lockstep
+        await asyncio.sleep(delay * random.uniform(0.8, 1.2))
+        delay = min(delay * 1.618, POLLING_MAX)
+
     raise Exception(f"Transcription timed out after {max_wait}s")
 
 
@@ -74,14 +182,14 @@ def format_transcript_with_speakers(result: dict) -> str:
     """Format transcript with speaker labels"""
     if not result.get("utterances"):
         return result.get("text", "")
-    
+
     lines = []
     current_speaker = None
-    
+
     for utterance in result["utterances"]:
         speaker = utterance["speaker"]
         text = utterance["text"]
-        
+
         if speaker != current_speaker:
             current_speaker = speaker
             # Map speaker labels to likely names (A = host Michael, B = guest typically)
@@ -89,133 +197,320 @@ def format_transcript_with_speakers(result: dict) -> str:
             lines.append(f"\n**{speaker_name}:** {text}")
         else:
             lines.append(text)
-    
+
     return " ".join(lines)
 
 
+def write_transcript_files(episode_num: str, youtube_id: str, result: dict) -> Path:
+    """Write the formatted markdown plus raw JSON for a completed transcription"""
+    formatted = format_transcript_with_speakers(result)
+
+    TRANSCRIPTS_DIR.mkdir(parents=True, exist_ok=True)
+    output_file = TRANSCRIPTS_DIR / f"ep{episode_num}_{youtube_id}.md"
+    output_file.write_text(f"# Episode {episode_num} Transcript\n\n{formatted}")
+
+    # Also save raw JSON for reference
+    raw_file = TRANSCRIPTS_DIR / f"ep{episode_num}_{youtube_id}.json"
+    raw_file.write_bytes(orjson.dumps(result, option=orjson.OPT_INDENT_2))
+    return output_file
+
+
+# Per-episode state changes append to a cheap JSONL event log; the full
+# snapshot is only rewritten at checkpoint boundaries
+PROGRESS_LOG_FILE = PROGRESS_FILE.with_suffix('.jsonl')
+CHECKPOINT_EVERY = 25
+_progress_log = None
+_events_since_snapshot = 0
+
+
+def _append_event(event: dict):
+    global _progress_log
+    if _progress_log is None:
+        _progress_log = open(PROGRESS_LOG_FILE, 'ab')
+    _progress_log.write(orjson.dumps(event) + b"\n")
+    _progress_log.flush()
+
+
+def _apply_event(progress: dict, event: dict):
+    ep = event["ep"]
+    state = event["state"]
+    if state == "pending":
+        progress.setdefault("pending", {})[ep] = event.get("transcript_id")
+    elif state == "completed":
+        if ep not in progress["completed"]:
+            progress["completed"].append(ep)
+        progress.get("pending", {}).pop(ep, None)
+    elif state == "failed":
+        entry = {"episode": ep, "error": event.get("error")}
+        if entry not in progress.setdefault("failed", []):
+            progress["failed"].append(entry)
+        progress.get("pending", {}).pop(ep, None)
+
+
+def record_event(progress: dict, episode_num: str, state: str, checkpoint: bool = True, **extra):
+    """Apply a state change and append it to the event log.
+
+    checkpoint=False appends without ever snapshotting - used by the webhook
+    server, which must not truncate a log another process is writing to.
+    """
+    global _events_since_snapshot
+    event = {"ep": episode_num, "state": state, "ts": time.time(), **extra}
+    _apply_event(progress, event)
+    _append_event(event)
+
+    _events_since_snapshot += 1
+    if checkpoint and _events_since_snapshot >= CHECKPOINT_EVERY:
+        save_progress(progress)
+
+
 def load_progress() -> dict:
-    """Load progress from file"""
+    """Load the last snapshot and replay events recorded since"""
+    progress = {"completed": [], "failed": [], "pending": {}}
     if PROGRESS_FILE.exists():
-        return json.loads(PROGRESS_FILE.read_text())
-    return {"completed": [], "failed": [], "pending": {}}
+        progress.update(orjson.loads(PROGRESS_FILE.read_bytes()))
+    if PROGRESS_LOG_FILE.exists():
+        for line in PROGRESS_LOG_FILE.read_text().splitlines():
+            if line.strip():
+                _apply_event(progress, orjson.loads(line))
+    return progress
 
 
 def save_progress(progress: dict):
-    """Save progress to file"""
-    PROGRESS_FILE.write_text(json.dumps(progress, indent=2))
+    """Write a full snapshot (atomically) and reset the event log"""
+    global _progress_log, _events_since_snapshot
+    # The webhook server appends to the same log from another process; fold
+    # every logged event into the snapshot before truncating so its
+    # completions can't be reverted to pending (replay is idempotent)
+    if PROGRESS_LOG_FILE.exists():
+        for line in PROGRESS_LOG_FILE.read_text().splitlines():
+            if line.strip():
+                _apply_event(progress, orjson.loads(line))
+    # Write-to-temp + rename so a crash mid-write can't lose pending
+    # transcript IDs that AssemblyAI already billed for
+    tmp = PROGRESS_FILE.with_suffix('.json.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(orjson.dumps(progress, option=orjson.OPT_INDENT_2))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, PROGRESS_FILE)
+    if _progress_log is not None:
+        _progress_log.close()
+        _progress_log = None
+    PROGRESS_LOG_FILE.write_text("")
+    _events_since_snapshot = 0
 
 
-def transcribe_episode(episode_num: str, youtube_id: str, progress: dict) -> bool:
+async def transcribe_episode(session: aiohttp.ClientSession, sem: asyncio.Semaphore,
+                             episode_num: str, youtube_id: str, progress: dict,
+                             single_shot: bool = False) -> bool:
     """Transcribe a single episode"""
     output_file = TRANSCRIPTS_DIR / f"ep{episode_num}_{youtube_id}.md"
-    
+
     if output_file.exists():
         print(f"  Already exists: {output_file.name}")
         return True
-    
+
     if episode_num in progress.get("completed", []):
         print(f"  Already completed in progress")
         return True
-    
-    try:
-        # Check if we have a pending transcription
-        if episode_num in progress.get("pending", {}):
-            transcript_id = progress["pending"][episode_num]
-            print(f"  Resuming pending transcription: {transcript_id}")
-        else:
-            print(f"  Getting audio URL...")
-            audio_url = get_youtube_audio_url(youtube_id)
-            
-            print(f"  Submitting to AssemblyAI...")
-            transcript_id = submit_transcription(audio_url)
-            
-            # Save as pending
-            progress.setdefault("pending", {})[episode_num] = transcript_id
-            save_progress(progress)
-        
-        print(f"  Waiting for transcription (ID: {transcript_id})...")
-        result = poll_transcription(transcript_id)
-        
-        # Format and save
-        formatted = format_transcript_with_speakers(result)
-        
-        TRANSCRIPTS_DIR.mkdir(parents=True, exist_ok=True)
-        output_file.write_text(f"# Episode {episode_num} Transcript\n\n{formatted}")
-        
-        # Also save raw JSON for reference
-        raw_file = TRANSCRIPTS_DIR / f"ep{episode_num}_{youtube_id}.json"
-        raw_file.write_text(json.dumps(result, indent=2))
-        
-        # Update progress
-        progress["completed"].append(episode_num)
-        progress["pending"].pop(episode_num, None)
-        save_progress(progress)
-        
+
+    # A cached raw result for this video + config needs no API calls at all
+    cache_file = _cache_path(youtube_id)
+    if cache_file.exists():
+        print(f"  Using cached result")
+        result = orjson.loads(cache_file.read_bytes())
+        output_file = write_transcript_files(episode_num, youtube_id, result)
+        async with PROGRESS_LOCK:
+            record_event(progress, episode_num, "completed")
         print(f"  ✓ Saved: {output_file.name}")
         return True
-        
-    except Exception as e:
-        print(f"  ✗ Error: {e}")
-        progress.setdefault("failed", []).append({"episode": episode_num, "error": str(e)})
-        progress["pending"].pop(episode_num, None)
-        save_progress(progress)
-        return False
+
+    async with sem:
+        try:
+            # Check if we have a pending transcription
+            if episode_num in progress.get("pending", {}):
+                transcript_id = progress["pending"][episode_num]
+                print(f"  Resuming pending transcription: {transcript_id}")
+            else:
+                print(f"  Getting audio URL...")
+                audio_url = await get_youtube_audio_url(youtube_id)
+
+                if single_shot:
+                    # SDK waits server-side; skips the submit/pending/poll cycle
+                    print(f"  Transcribing (single shot)...")
+                    result = await asyncio.to_thread(transcribe_single_shot, audio_url)
+                    _store_cached_result(youtube_id, result)
+                    output_file = write_transcript_files(episode_num, youtube_id, result)
+                    async with PROGRESS_LOCK:
+                        record_event(progress, episode_num, "completed")
+                    print(f"  ✓ Saved: {output_file.name}")
+                    return True
+
+                print(f"  Submitting to AssemblyAI...")
+                transcript_id = await submit_transcription(session, audio_url)
+
+                # Save as pending
+                async with PROGRESS_LOCK:
+                    record_event(progress, episode_num, "pending", transcript_id=transcript_id)
+
+            if WEBHOOK_URL:
+                # Result arrives via the webhook server; leave the episode pending
+                print(f"  Submitted (ID: {transcript_id}), webhook will deliver the result")
+                return True
+
+            print(f"  Waiting for transcription (ID: {transcript_id})...")
+            result = await poll_transcription(session, transcript_id)
+
+            _store_cached_result(youtube_id, result)
+            output_file = write_transcript_files(episode_num, youtube_id, result)
+
+            # Update progress
+            async with PROGRESS_LOCK:
+                record_event(progress, episode_num, "completed")
+
+            print(f"  ✓ Saved: {output_file.name}")
+            return True
+
+        except Exception as e:
+            print(f"  ✗ Error: {e}")
+            async with PROGRESS_LOCK:
+                record_event(progress, episode_num, "failed", error=str(e))
+            return False
 
 
 def get_episodes_to_transcribe(limit: int = None) -> list:
     """Get list of episodes that need transcription"""
-    episodes_file = REPO_DIR / "episodes.json"
-    episodes = json.loads(episodes_file.read_text())
-    
+    episodes = load_episodes()
+
+    # One readdir instead of a stat() per candidate episode
+    TRANSCRIPTS_DIR.mkdir(parents=True, exist_ok=True)
+    existing = {e.name for e in os.scandir(TRANSCRIPTS_DIR) if e.name.endswith('.md')}
+
     to_transcribe = []
     for ep in episodes:
         episode_num = ep.get("episode")
-        youtube_link = ep.get("link") or ""
-        
-        # Extract YouTube ID
-        youtube_id = None
-        if "youtube.com/watch?v=" in youtube_link:
-            youtube_id = youtube_link.split("v=")[1].split("&")[0]
-        elif "youtu.be/" in youtube_link:
-            youtube_id = youtube_link.split("youtu.be/")[1].split("?")[0]
-        
+        youtube_id = extract_youtube_id(ep.get("link"))
         if not youtube_id:
             continue
-        
+
         # Check if already transcribed
-        output_file = TRANSCRIPTS_DIR / f"ep{episode_num}_{youtube_id}.md"
-        if not output_file.exists():
+        if f"ep{episode_num}_{youtube_id}.md" not in existing:
             to_transcribe.append({
                 "episode": episode_num,
                 "youtube_id": youtube_id,
                 "guest": ep.get("guest", "Unknown")
             })
-    
+
     # Sort by episode number descending (newest first)
     to_transcribe.sort(key=lambda x: int(x["episode"]), reverse=True)
-    
+
     if limit:
         to_transcribe = to_transcribe[:limit]
-    
+
     return to_transcribe
 
 
+async def run_batch(episodes: list, progress: dict, concurrency: int, single_shot: bool = False) -> tuple:
+    """Run transcriptions concurrently under one session, bounded by a semaphore"""
+    sem = asyncio.Semaphore(concurrency)
+
+    async with aiohttp.ClientSession(headers=HEADERS, timeout=aiohttp.ClientTimeout(total=None)) as session:
+        tasks = []
+        for ep in episodes:
+            print(f"Queueing Episode {ep['episode']}: {ep['guest']}")
+            tasks.append(transcribe_episode(session, sem, ep["episode"], ep["youtube_id"], progress, single_shot=single_shot))
+
+        results = await asyncio.gather(*tasks)
+
+    success = sum(1 for r in results if r)
+    return success, len(results) - success
+
+
+async def run_single(episode_num: str, youtube_id: str, progress: dict, single_shot: bool = False) -> bool:
+    """Transcribe one episode with its own session"""
+    sem = asyncio.Semaphore(1)
+    async with aiohttp.ClientSession(headers=HEADERS, timeout=aiohttp.ClientTimeout(total=None)) as session:
+        return await transcribe_episode(session, sem, episode_num, youtube_id, progress, single_shot=single_shot)
+
+
+def run_webhook_server(port: int):
+    """Receive AssemblyAI webhook callbacks and finalize pending episodes.
+
+    The server is append-only on the progress log: compaction into the
+    snapshot happens only in the (single-writer) batch process, so
+    concurrent handlers and the submitter can't truncate each other's
+    events away.
+    """
+    from aiohttp import web
+
+    async def handle(request):
+        payload = await request.json()
+        transcript_id = payload.get("transcript_id")
+        status = payload.get("status")
+
+        progress = load_progress()
+        episode_num = next((ep for ep, tid in progress.get("pending", {}).items() if tid == transcript_id), None)
+        if not episode_num:
+            print(f"Webhook for unknown transcript: {transcript_id}")
+            return web.Response(text="ok")
+
+        print(f"Webhook: episode {episode_num} -> {status}")
+
+        if status != "completed":
+            record_event(progress, episode_num, "failed", error=f"webhook status: {status}", checkpoint=False)
+            return web.Response(text="ok")
+
+        # Single authoritative GET for the full result
+        async with aiohttp.ClientSession(headers=HEADERS) as session:
+            async with session.get(f"{BASE_URL}/transcript/{transcript_id}") as resp:
+                resp.raise_for_status()
+                result = await resp.json()
+
+        youtube_id = _youtube_id_for(episode_num)
+        output_file = write_transcript_files(episode_num, youtube_id or "unknown", result)
+
+        record_event(progress, episode_num, "completed", checkpoint=False)
+
+        print(f"  ✓ Saved: {output_file.name}")
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_post("/", handle)
+    print(f"Webhook server listening on port {port}")
+    web.run_app(app, port=port)
+
+
+def _youtube_id_for(episode_num: str) -> str:
+    """Look up the YouTube ID for an episode number from episodes.json"""
+    ep = next((e for e in load_episodes() if e.get("episode") == episode_num), None)
+    return extract_youtube_id((ep or {}).get("link"))
+
+
 def main():
     import argparse
     parser = argparse.ArgumentParser(description="Transcribe 20 Minute Leaders episodes with AssemblyAI")
     parser.add_argument("--limit", type=int, help="Max episodes to process")
     parser.add_argument("--episode", type=str, help="Specific episode number to transcribe")
     parser.add_argument("--list", action="store_true", help="List episodes needing transcription")
+    parser.add_argument("--concurrency", type=int, default=8, help="Max transcriptions in flight")
+    parser.add_argument("--webhook-server", type=int, metavar="PORT",
+                        help="Run the webhook receiver for TRANSCRIPT_WEBHOOK_URL callbacks")
+    parser.add_argument("--single-shot", action="store_true",
+                        help="Use the SDK's create-and-wait call instead of the poll loop")
     args = parser.parse_args()
-    
+
     if not ASSEMBLYAI_API_KEY:
         print("Error: ASSEMBLYAI_API_KEY not set")
         print("Set it via: export ASSEMBLYAI_API_KEY=your_key")
         print("Or save to: ~/.config/assemblyai/api_key")
         sys.exit(1)
-    
+
+    if args.webhook_server:
+        run_webhook_server(args.webhook_server)
+        return
+
     progress = load_progress()
-    
+
     if args.list:
         episodes = get_episodes_to_transcribe()
         print(f"Episodes needing transcription: {len(episodes)}")
@@ -224,46 +519,33 @@ def main():
         if len(episodes) > 20:
             print(f"  ... and {len(episodes) - 20} more")
         return
-    
+
     if args.episode:
         # Find specific episode
-        episodes_file = REPO_DIR / "episodes.json"
-        episodes = json.loads(episodes_file.read_text())
+        episodes = load_episodes()
         ep_data = next((e for e in episodes if e["episode"] == args.episode), None)
-        
+
         if not ep_data:
             print(f"Episode {args.episode} not found")
             sys.exit(1)
-        
-        youtube_link = ep_data.get("link") or ""
-        youtube_id = None
-        if "youtube.com/watch?v=" in youtube_link:
-            youtube_id = youtube_link.split("v=")[1].split("&")[0]
-        elif "youtu.be/" in youtube_link:
-            youtube_id = youtube_link.split("youtu.be/")[1].split("?")[0]
-        
+
+        youtube_id = extract_youtube_id(ep_data.get("link"))
         if not youtube_id:
             print(f"No YouTube link for episode {args.episode}")
             sys.exit(1)
-        
+
         print(f"Transcribing Episode {args.episode}: {ep_data.get('guest', 'Unknown')}")
-        transcribe_episode(args.episode, youtube_id, progress)
+        asyncio.run(run_single(args.episode, youtube_id, progress, single_shot=args.single_shot))
+        save_progress(progress)
         return
-    
+
     # Batch mode
     episodes = get_episodes_to_transcribe(limit=args.limit)
     print(f"Processing {len(episodes)} episodes...")
-    
-    success = 0
-    failed = 0
-    
-    for i, ep in enumerate(episodes):
-        print(f"\n[{i+1}/{len(episodes)}] Episode {ep['episode']}: {ep['guest']}")
-        if transcribe_episode(ep["episode"], ep["youtube_id"], progress):
-            success += 1
-        else:
-            failed += 1
-    
+
+    success, failed = asyncio.run(run_batch(episodes, progress, args.concurrency, single_shot=args.single_shot))
+    save_progress(progress)
+
     print(f"\n✓ Completed: {success}")
     print(f"✗ Failed: {failed}")
 
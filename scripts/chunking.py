@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+Shared transcript chunking for the Notion sync scripts.
+"""
+
+def chunk_text(s, size=1900):
+    """Split text into <=size chunks, breaking at the last space before the limit.
+
+    The boundary search runs in C via str.rfind, so per-chunk Python work is
+    constant instead of per-word (Notion caps blocks at 2000 chars).
+    """
+    chunks = []
+    i = 0
+    n = len(s)
+    while i < n:
+        j = min(i + size, n)
+        if j < n:
+            k = s.rfind(' ', i, j)
+            if k > i:
+                j = k
+        chunks.append(s[i:j])
+        # Skip the boundary space; keep the char if we had to cut mid-word
+        i = j + 1 if j < n and s[j] == ' ' else j
+    return chunks
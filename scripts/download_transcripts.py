@@ -1,42 +1,50 @@
 #!/usr/bin/env python3
 """Download .srt transcript files from Google Drive and map to episodes."""
-import json
+import atexit
 import os
 import subprocess
 import re
-from difflib import SequenceMatcher
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import httpx
+import orjson
+from rapidfuzz import process, fuzz
 
 # Config
 TOKENS_FILE = os.path.expanduser("~/.clawdbot/genie-email/tokens.json")
 TRANSCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "transcripts")
 EPISODES_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "episodes.json")
 
+# One HTTP/2 client for the whole run - pools connections and multiplexes
+# the many small Drive requests onto a single TLS socket
+CLIENT = httpx.Client(http2=True, timeout=httpx.Timeout(120.0),
+                      limits=httpx.Limits(max_connections=32, max_keepalive_connections=16))
+atexit.register(CLIENT.close)
+
 def get_access_token():
-    with open(TOKENS_FILE) as f:
-        return json.load(f)['access_token']
+    with open(TOKENS_FILE, 'rb') as f:
+        return orjson.loads(f.read())['access_token']
 
 def drive_search(query, token):
     """Search Drive for files matching query."""
-    import urllib.request
     import urllib.parse
-    
+
     url = f"https://www.googleapis.com/drive/v3/files?q={urllib.parse.quote(query)}&pageSize=1000&fields=files(id,name,mimeType)"
-    req = urllib.request.Request(url, headers={"Authorization": f"Bearer {token}"})
-    with urllib.request.urlopen(req, timeout=60) as resp:
-        return json.loads(resp.read().decode()).get('files', [])
+    resp = CLIENT.get(url, headers={"Authorization": f"Bearer {token}"})
+    resp.raise_for_status()
+    return resp.json().get('files', [])
 
 def download_file(file_id, filename, token):
     """Download a file from Drive."""
-    import urllib.request
-    
     url = f"https://www.googleapis.com/drive/v3/files/{file_id}?alt=media"
-    req = urllib.request.Request(url, headers={"Authorization": f"Bearer {token}"})
-    
+
     filepath = os.path.join(TRANSCRIPTS_DIR, filename)
     try:
-        with urllib.request.urlopen(req, timeout=120) as resp:
+        # Stream to disk so peak memory stays flat regardless of file size
+        with CLIENT.stream('GET', url, headers={"Authorization": f"Bearer {token}"}) as resp:
+            resp.raise_for_status()
             with open(filepath, 'wb') as f:
-                f.write(resp.read())
+                for chunk in resp.iter_bytes(chunk_size=262144):
+                    f.write(chunk)
         return filepath
     except Exception as e:
         print(f"  Error downloading {filename}: {e}")
@@ -51,55 +59,66 @@ def normalize_name(name):
     name = re.sub(r'\s+', ' ', name).strip()
     return name
 
-def match_guest(srt_name, episodes):
+def build_guest_index(episodes):
+    """Normalize every guest name once, up front."""
+    eps = [ep for ep in episodes if ep.get('guest')]
+    return [normalize_name(ep['guest']) for ep in eps], eps
+
+def match_guest(srt_name, guest_norms, guest_eps):
     """Find best matching episode for a transcript filename."""
     norm_srt = normalize_name(srt_name)
-    
-    best_match = None
-    best_score = 0
-    
-    for ep in episodes:
-        guest = ep.get('guest', '').lower()
-        if not guest:
-            continue
-        
-        # Try exact match first
+
+    # Try exact containment first
+    for guest, ep in zip(guest_norms, guest_eps):
         if guest in norm_srt or norm_srt in guest:
             return ep, 1.0
-        
-        # Fuzzy match
-        score = SequenceMatcher(None, norm_srt, guest).ratio()
-        if score > best_score and score > 0.6:
-            best_score = score
-            best_match = ep
-    
-    return best_match, best_score
+
+    # Fuzzy match - rapidfuzz batches the whole list in C
+    best = process.extractOne(norm_srt, guest_norms, scorer=fuzz.WRatio, score_cutoff=60)
+    if best:
+        _, score, idx = best
+        return guest_eps[idx], score / 100.0
+
+    return None, 0
+
+# Strips sequence numbers, timestamps and cue lines in one C-level pass
+_SRT_STRIP_RE = re.compile(r'(?m)^\s*(?:\d+|\d{2}:\d{2}:\d{2}[^\n]*|[^\n]*-->[^\n]*)\s*$\n?')
 
 def srt_to_text(srt_content):
     """Convert SRT format to plain text."""
-    lines = srt_content.split('\n')
-    text_lines = []
-    
-    for line in lines:
-        line = line.strip()
-        # Skip timestamps and sequence numbers
-        if re.match(r'^\d+$', line):
-            continue
-        if re.match(r'^\d{2}:\d{2}:\d{2}', line):
-            continue
-        if '-->' in line:
-            continue
-        if line:
-            text_lines.append(line)
-    
-    return ' '.join(text_lines)
+    return ' '.join(_SRT_STRIP_RE.sub('', srt_content).split())
+
+def _download_and_convert(srt, ep, score, token):
+    """Download one srt from Drive, write its text version, return a mapping entry."""
+    filepath = download_file(srt['id'], srt['name'], token)
+    if not filepath:
+        return None
+
+    # Convert to text
+    with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
+        srt_content = f.read()
+    text = srt_to_text(srt_content)
+
+    # Save text version
+    text_path = filepath.replace('.srt', '.txt')
+    with open(text_path, 'w') as f:
+        f.write(text)
+
+    return {
+        'episode': ep.get('episode'),
+        'guest': ep.get('guest'),
+        'srt_file': srt['name'],
+        'drive_id': srt['id'],
+        'score': score,
+        'text_path': text_path
+    }
 
 def main():
     os.makedirs(TRANSCRIPTS_DIR, exist_ok=True)
     
     print("Loading episodes...")
-    with open(EPISODES_FILE) as f:
-        episodes = json.load(f)
+    with open(EPISODES_FILE, 'rb') as f:
+        episodes = orjson.loads(f.read())
     print(f"  Loaded {len(episodes)} episodes")
     
     print("\nGetting access token...")
@@ -115,48 +134,36 @@ def main():
                     or any(c.isalpha() for c in f['name'].split('.')[0])]
     print(f"  {len(episode_srts)} appear to be episode transcripts")
     
-    # Match and download
-    matched = 0
-    downloaded = 0
-    mapping = []
-    
-    print("\nMatching and downloading transcripts...")
-    for srt in episode_srts:  # Start with first 50
-        ep, score = match_guest(srt['name'], episodes)
+    # Phase 1: match (pure CPU, serial)
+    print("\nMatching transcripts...")
+    guest_norms, guest_eps = build_guest_index(episodes)
+    matches = []
+    for srt in episode_srts:
+        ep, score = match_guest(srt['name'], guest_norms, guest_eps)
         if ep and score >= 0.6:
-            matched += 1
             print(f"  ✓ {srt['name']} → Ep{ep.get('episode')} {ep.get('guest')} (score: {score:.2f})")
-            
-            # Download
-            filepath = download_file(srt['id'], srt['name'], token)
-            if filepath:
-                downloaded += 1
-                
-                # Convert to text
-                with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-                    srt_content = f.read()
-                text = srt_to_text(srt_content)
-                
-                # Save text version
-                text_path = filepath.replace('.srt', '.txt')
-                with open(text_path, 'w') as f:
-                    f.write(text)
-                
-                mapping.append({
-                    'episode': ep.get('episode'),
-                    'guest': ep.get('guest'),
-                    'srt_file': srt['name'],
-                    'drive_id': srt['id'],
-                    'score': score,
-                    'text_path': text_path
-                })
+            matches.append((srt, ep, score))
         else:
             print(f"  ✗ {srt['name']} - no match found")
+    matched = len(matches)
+
+    # Phase 2: download + convert (I/O bound, fan out across threads)
+    print(f"\nDownloading {matched} transcripts...")
+    downloaded = 0
+    mapping = []
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(_download_and_convert, srt, ep, score, token) for srt, ep, score in matches]
+        for fut in as_completed(futures):
+            entry = fut.result()
+            if entry:
+                downloaded += 1
+                mapping.append(entry)
     
     # Save mapping
     mapping_file = os.path.join(TRANSCRIPTS_DIR, 'mapping.json')
-    with open(mapping_file, 'w') as f:
-        json.dump(mapping, f, indent=2)
+    with open(mapping_file, 'wb') as f:
+        f.write(orjson.dumps(mapping, option=orjson.OPT_INDENT_2))
     
     print(f"\nDone! Matched: {matched}, Downloaded: {downloaded}")
     print(f"Mapping saved to: {mapping_file}")
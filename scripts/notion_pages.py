@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Shared Notion episode-page index for the sync scripts.
+
+Maps "Episode No." -> page id, prefetched in bulk so the sync loops do no
+lookup queries. Page ids are stable, so the mapping persists in
+page_id_cache.json across scripts and runs; re-runs skip the database
+queries entirely.
+"""
+import json
+import os
+
+DB_ID = "13fb1a3e-b70a-4c63-afd6-08bba2e05a3e"
+PAGE_ID_CACHE_FILE = os.path.join(os.path.dirname(__file__), "page_id_cache.json")
+
+PAGE_INDEX = {}
+
+# The single-episode fallback query varies only in one integer, so the
+# body scaffold is encoded once
+_EP_QUERY_PREFIX = b'{"filter":{"property":"Episode No.","number":{"equals":'
+_EP_QUERY_SUFFIX = b'}},"page_size":1}'
+
+def _read_cache_file():
+    if os.path.exists(PAGE_ID_CACHE_FILE):
+        try:
+            return json.load(open(PAGE_ID_CACHE_FILE))
+        except ValueError:
+            pass  # partial/corrupt cache just means requerying
+    return {}
+
+def load_page_id_cache():
+    """Seed PAGE_INDEX from the on-disk cache."""
+    for k, v in _read_cache_file().items():
+        PAGE_INDEX[int(k)] = v
+
+def save_page_id_cache():
+    """Write the cache atomically, merging ids other processes saved meanwhile.
+
+    Sharded runs save concurrently, so re-read before writing (no shard drops
+    another's ids) and rename a per-pid temp file into place (no reader ever
+    sees a truncated file).
+    """
+    merged = _read_cache_file()
+    merged.update({str(k): v for k, v in PAGE_INDEX.items()})
+    tmp = f"{PAGE_ID_CACHE_FILE}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(dict(sorted(merged.items(), key=lambda kv: int(kv[0]))), f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, PAGE_ID_CACHE_FILE)
+
+def build_page_index(notion_request, ep_nums, echo=print):
+    """Resolve page ids for episodes not already cached, with chunked or-filters.
+
+    notion_request is the calling script's request helper: it takes
+    (url, method=, data=) and returns parsed JSON or None on failure.
+    """
+    nums = sorted({int(n) for n in ep_nums if str(n).isdigit()} - set(PAGE_INDEX))
+    for i in range(0, len(nums), 50):
+        batch = nums[i:i + 50]
+        cursor = None
+        while True:
+            body = {
+                "filter": {"or": [{"property": "Episode No.", "number": {"equals": n}} for n in batch]},
+                "page_size": 100
+            }
+            if cursor:
+                body["start_cursor"] = cursor
+            data = notion_request(f"https://api.notion.com/v1/databases/{DB_ID}/query", method='POST', data=body)
+            if not data:
+                break
+            for r in data.get("results", []):
+                num = r.get("properties", {}).get("Episode No.", {}).get("number")
+                if num is not None:
+                    PAGE_INDEX[int(num)] = r["id"]
+            if not data.get("has_more"):
+                break
+            cursor = data.get("next_cursor")
+    if nums:
+        save_page_id_cache()
+    echo(f"Resolved {len(PAGE_INDEX)} episode pages ({(len(nums) + 49) // 50} batched queries, rest cached)")
+
+def find_episode_page(notion_request, episode_num):
+    """Find the Notion page for an episode number, preferring the index."""
+    cached = PAGE_INDEX.get(int(episode_num))
+    if cached:
+        return cached
+    data = notion_request(
+        f"https://api.notion.com/v1/databases/{DB_ID}/query",
+        method='POST',
+        data=_EP_QUERY_PREFIX + str(int(episode_num)).encode() + _EP_QUERY_SUFFIX
+    )
+    if data and data.get('results'):
+        PAGE_INDEX[int(episode_num)] = data['results'][0]['id']
+        return data['results'][0]['id']
+    return None
@@ -4,10 +4,17 @@ Pull YouTube captions for all episodes with youtubeId.
 Saves as .txt files in transcripts/youtube/ folder.
 """
 
-import json
+import argparse
+import re
 import subprocess
 import os
 import sys
+import threading
+
+import orjson
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import groupby
+from multiprocessing import Pool
 from pathlib import Path
 
 REPO_DIR = Path(__file__).parent.parent
@@ -15,32 +22,71 @@ TRANSCRIPTS_DIR = REPO_DIR / "transcripts" / "youtube"
 EPISODES_FILE = REPO_DIR / "js" / "episodes.js"
 PROGRESS_FILE = REPO_DIR / "scripts" / "caption_progress.json"
 
+# One pass strips WEBVTT headers, cue numbers, timestamp lines and HTML-like tags
+_VTT_STRIP_RE = re.compile(r'(?m)^\s*(?:WEBVTT[^\n]*|Kind:[^\n]*|Language:[^\n]*|\d+|[^\n]*-->[^\n]*)\s*$\n?|<[^>]+>')
+
 def load_episodes():
     with open(EPISODES_FILE) as f:
         content = f.read()
         start = content.find('[')
         end = content.rfind(']') + 1
-        return json.loads(content[start:end])
+        return orjson.loads(content[start:end])
+
+# State changes append to a JSONL event log; the snapshot is only rewritten
+# at checkpoints so a long backfill doesn't rewrite a growing file every time
+PROGRESS_LOG_FILE = PROGRESS_FILE.with_suffix('.jsonl')
+_progress_log = None
+
+def _append_event(event):
+    global _progress_log
+    if _progress_log is None:
+        _progress_log = open(PROGRESS_LOG_FILE, 'ab')
+    _progress_log.write(orjson.dumps(event) + b"\n")
+    _progress_log.flush()
+
+def record_event(progress, yt_id, state):
+    """Apply a state change and append it to the event log."""
+    progress[state].append(yt_id)
+    _append_event({"yt": yt_id, "state": state})
 
 def load_progress():
+    progress = {"completed": [], "failed": [], "no_captions": []}
     if PROGRESS_FILE.exists():
-        with open(PROGRESS_FILE) as f:
-            return json.load(f)
-    return {"completed": [], "failed": [], "no_captions": []}
+        progress.update(orjson.loads(PROGRESS_FILE.read_bytes()))
+    # Replay events recorded since the last snapshot
+    if PROGRESS_LOG_FILE.exists():
+        with open(PROGRESS_LOG_FILE) as f:
+            for line in f:
+                if line.strip():
+                    event = orjson.loads(line)
+                    if event["yt"] not in progress[event["state"]]:
+                        progress[event["state"]].append(event["yt"])
+    return progress
 
 def save_progress(progress):
-    with open(PROGRESS_FILE, 'w') as f:
-        json.dump(progress, f, indent=2)
+    """Write a full snapshot (atomically) and reset the event log."""
+    global _progress_log
+    tmp = PROGRESS_FILE.with_suffix('.json.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(orjson.dumps(progress, option=orjson.OPT_INDENT_2))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, PROGRESS_FILE)
+    if _progress_log is not None:
+        _progress_log.close()
+        _progress_log = None
+    if PROGRESS_LOG_FILE.exists():
+        PROGRESS_LOG_FILE.write_text("")
 
-def download_captions(youtube_id, episode_num):
+def download_captions(youtube_id, episode_num, existing_names):
     """Download captions for a single video using yt-dlp."""
-    output_path = TRANSCRIPTS_DIR / f"ep{episode_num}_{youtube_id}"
-    
-    # Skip if already downloaded
-    txt_file = Path(str(output_path) + ".en.vtt")
-    if txt_file.exists() or Path(str(output_path) + ".en.vtt").exists():
+    stem = f"ep{episode_num}_{youtube_id}"
+    output_path = TRANSCRIPTS_DIR / stem
+
+    # Skip if already downloaded - in-memory check, no stat calls
+    if f"{stem}.en.vtt" in existing_names:
         return "exists"
-    
+
     cmd = [
         "yt-dlp",
         "--write-auto-sub",
@@ -49,18 +95,18 @@ def download_captions(youtube_id, episode_num):
         "--output", str(output_path),
         f"https://www.youtube.com/watch?v={youtube_id}"
     ]
-    
+
     try:
         result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-        
-        # Check if any subtitle file was created
-        for ext in [".en.vtt", ".en.srt", ".vtt", ".srt"]:
-            if Path(str(output_path) + ext).exists():
+
+        # One readdir instead of probing four extensions with exists()
+        for entry in os.scandir(TRANSCRIPTS_DIR):
+            if entry.name.startswith(stem) and entry.name.endswith((".vtt", ".srt")):
                 return "success"
-        
+
         if "no subtitles" in result.stderr.lower() or "no automatic captions" in result.stderr.lower():
             return "no_captions"
-        
+
         return "failed"
     except subprocess.TimeoutExpired:
         return "timeout"
@@ -76,42 +122,28 @@ def convert_vtt_to_txt(vtt_path):
     
     try:
         with open(vtt_path) as f:
-            lines = f.readlines()
-        
-        # Skip header and timestamps, extract text
-        text_lines = []
-        for line in lines:
-            line = line.strip()
-            # Skip empty, timestamps, WEBVTT header, and position markers
-            if not line or '-->' in line or line.startswith('WEBVTT') or line.startswith('Kind:') or line.startswith('Language:'):
-                continue
-            # Skip lines that are just numbers (cue identifiers)
-            if line.isdigit():
-                continue
-            # Remove HTML-like tags
-            import re
-            line = re.sub(r'<[^>]+>', '', line)
-            if line:
-                text_lines.append(line)
-        
+            content = f.read()
+
+        # Strip header, timestamps, cue numbers and tags in one regex pass
+        text_lines = (line.strip() for line in _VTT_STRIP_RE.sub('', content).splitlines())
+
         # Remove duplicate consecutive lines (common in auto-captions)
-        deduped = []
-        prev = None
-        for line in text_lines:
-            if line != prev:
-                deduped.append(line)
-                prev = line
-        
+        deduped = [line for line, _ in groupby(line for line in text_lines if line)]
+
         with open(txt_path, 'w') as f:
             f.write('\n'.join(deduped))
-        
+
         print(f"  Converted to: {txt_path.name}")
     except Exception as e:
         print(f"  Error converting {vtt_path}: {e}")
 
 def main():
+    parser = argparse.ArgumentParser(description="Pull YouTube captions for all episodes")
+    parser.add_argument("--concurrency", type=int, default=16, help="Parallel yt-dlp downloads")
+    args = parser.parse_args()
+
     TRANSCRIPTS_DIR.mkdir(parents=True, exist_ok=True)
-    
+
     episodes = load_episodes()
     progress = load_progress()
     
@@ -128,30 +160,40 @@ def main():
     print(f"Progress: {len(progress['completed'])} success, {len(progress['no_captions'])} no captions, {len(progress['failed'])} failed")
     print("-" * 50)
     
-    for i, (ep_num, yt_id) in enumerate(to_process):
-        print(f"[{i+1}/{len(to_process)}] Episode {ep_num} ({yt_id})...", end=" ", flush=True)
-        
-        result = download_captions(yt_id, ep_num)
-        print(result)
-        
-        if result == "success" or result == "exists":
-            progress['completed'].append(yt_id)
-        elif result == "no_captions":
-            progress['no_captions'].append(yt_id)
-        else:
-            progress['failed'].append(yt_id)
-        
-        # Save progress every 10 episodes
-        if (i + 1) % 10 == 0:
-            save_progress(progress)
-            print(f"  Progress saved: {len(progress['completed'])} completed")
-    
+    # Downloads are pure I/O waiting on YouTube, so fan out across threads
+    progress_lock = threading.Lock()
+    done = 0
+
+    existing_names = frozenset(e.name for e in os.scandir(TRANSCRIPTS_DIR))
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = {pool.submit(download_captions, yt, ep, existing_names): (ep, yt) for ep, yt in to_process}
+        for fut in as_completed(futures):
+            ep_num, yt_id = futures[fut]
+            result = fut.result()
+
+            with progress_lock:
+                done += 1
+                print(f"[{done}/{len(to_process)}] Episode {ep_num} ({yt_id})... {result}")
+
+                if result == "success" or result == "exists":
+                    record_event(progress, yt_id, 'completed')
+                elif result == "no_captions":
+                    record_event(progress, yt_id, 'no_captions')
+                else:
+                    record_event(progress, yt_id, 'failed')
+
+                # Save progress every 50 completions
+                if done % 50 == 0:
+                    save_progress(progress)
+                    print(f"  Progress saved: {len(progress['completed'])} completed")
+
     save_progress(progress)
     
-    # Convert all VTT files to TXT
+    # Convert all VTT files to TXT - pure CPU work, so use all cores
     print("\nConverting VTT to TXT...")
-    for vtt_file in TRANSCRIPTS_DIR.glob("*.vtt"):
-        convert_vtt_to_txt(vtt_file)
+    with Pool() as pool_procs:
+        pool_procs.map(convert_vtt_to_txt, list(TRANSCRIPTS_DIR.glob("*.vtt")), chunksize=16)
     
     print("\n" + "=" * 50)
     print(f"DONE!")
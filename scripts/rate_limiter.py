@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Shared token-bucket rate limiter for the sync scripts.
+"""
+import threading
+import time
+
+class Bucket:
+    """Token bucket that only sleeps when the allowance is spent.
+
+    Unlike a fixed post-request sleep, time already spent waiting on a slow
+    server refills the bucket, so fast turnarounds aren't padded with extra
+    idle time. Thread-safe.
+    """
+
+    def __init__(self, rps):
+        self.rps = rps
+        self.allowance = float(rps)
+        self.last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self):
+        """Consume one token, sleeping only if the bucket is empty."""
+        with self._lock:
+            now = time.monotonic()
+            self.allowance = min(self.rps, self.allowance + (now - self.last) * self.rps)
+            self.last = now
+            if self.allowance < 1:
+                wait = (1 - self.allowance) / self.rps
+                # Advance last past the sleep so the wait doesn't count as refill
+                self.last = now + wait
+                self.allowance = 0.0
+            else:
+                wait = 0.0
+                self.allowance -= 1
+        if wait:
+            time.sleep(wait)
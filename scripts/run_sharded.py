@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Run one of the sync scripts as N parallel shard processes.
+
+Each shard gets --shard I/N and works a disjoint slice of the episode list,
+so the CPU-bound prep work scales across cores and each process holds its
+own HTTP sessions.
+
+Usage:
+    python3 run_sharded.py sync_transcripts_to_notion.py [N]
+"""
+import subprocess
+import sys
+from multiprocessing import Pool
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).parent
+
+def run_shard(args):
+    script, i, n = args
+    return subprocess.run([sys.executable, str(SCRIPTS_DIR / script), "--shard", f"{i}/{n}"]).returncode
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__.strip())
+        sys.exit(1)
+
+    script = sys.argv[1]
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    print(f"Running {script} as {n} shards...")
+    with Pool(n) as pool:
+        codes = pool.map(run_shard, [(script, i, n) for i in range(n)])
+
+    failed = [i for i, code in enumerate(codes) if code]
+    if failed:
+        print(f"✗ Shards failed: {failed}")
+        sys.exit(1)
+    print(f"✓ All {n} shards finished")
+
+if __name__ == "__main__":
+    main()
@@ -7,13 +7,21 @@ Usage:
     python3 sync_transcripts_to_drive.py [--limit N] [--resume]
 """
 
+import atexit
 import json
-import urllib.request
+import logging
+import logging.handlers
 import os
-import time
+import queue
 import sys
 from datetime import datetime
 
+import httpx
+import orjson
+
+import notion_pages
+from rate_limiter import Bucket
+
 # Setup
 TOKENS_FILE = os.path.expanduser("~/.clawdbot/genie-email/tokens.json")
 NOTION_KEY_FILE = os.path.expanduser("~/.config/notion/api_key_michael")
@@ -21,191 +29,343 @@ MATCHED_FILE = "/tmp/matched_final.json"
 PROGRESS_FILE = os.path.expanduser("~/clawd/work/transcript_sync_progress.json")
 LOG_FILE = os.path.expanduser("~/clawd/work/transcript_sync.log")
 
+# log() used to reopen and append to LOG_FILE on every call; a queue listener
+# now writes from a background thread so logging never blocks the sync loop,
+# and rotation keeps the file bounded
+_log_queue = queue.SimpleQueue()
+_file_handler = logging.handlers.RotatingFileHandler(LOG_FILE, maxBytes=10_000_000, backupCount=3)
+_file_handler.setFormatter(logging.Formatter("[%(asctime)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S"))
+_listener = logging.handlers.QueueListener(_log_queue, _file_handler)
+_listener.start()
+atexit.register(_listener.stop)
+
+_logger = logging.getLogger("transcript_sync")
+_logger.setLevel(logging.INFO)
+_logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+
 def log(msg):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    line = f"[{timestamp}] {msg}"
-    print(line, flush=True)
-    with open(LOG_FILE, "a") as f:
-        f.write(line + "\n")
+    print(f"[{timestamp}] {msg}", flush=True)
+    _logger.info(msg)
+
+def _make_client(**headers):
+    """HTTP/2 client so calls to one host multiplex over a single TLS connection"""
+    return httpx.Client(
+        http2=True,
+        headers=headers,
+        timeout=httpx.Timeout(60.0),
+        limits=httpx.Limits(max_connections=8, max_keepalive_connections=4),
+        transport=httpx.HTTPTransport(retries=5),
+    )
+
+# Read once at import; notion_request used to re-read the key file per call
+NOTION_KEY = open(NOTION_KEY_FILE).read().strip()
+
+NOTION_SESSION = _make_client(**{"Authorization": f"Bearer {NOTION_KEY}",
+                                 "Notion-Version": "2022-06-28",
+                                 "Content-Type": "application/json"})
+DRIVE_SESSION = _make_client()
 
 def load_tokens():
     return json.load(open(TOKENS_FILE))
 
+# Buckets only sleep when we're actually over the limit, unlike the old
+# fixed post-request sleeps (Notion ~3 req/s; Drive well under 10/s/user)
+NOTION_BUCKET = Bucket(rps=3)
+DRIVE_BUCKET = Bucket(rps=8)
+
 def notion_request(url, data=None):
-    notion_key = open(NOTION_KEY_FILE).read().strip()
-    headers = {"Authorization": f"Bearer {notion_key}", "Notion-Version": "2022-06-28", "Content-Type": "application/json"}
-    req = urllib.request.Request(url, headers=headers, method='POST' if data else 'GET')
-    if data:
-        req.data = json.dumps(data).encode()
-    with urllib.request.urlopen(req, timeout=60) as resp:
-        return json.loads(resp.read().decode())
+    NOTION_BUCKET.take()
+    body = data if isinstance(data, bytes) or data is None else orjson.dumps(data)
+    resp = NOTION_SESSION.request('POST' if data else 'GET', url, content=body, timeout=60)
+    resp.raise_for_status()
+    return orjson.loads(resp.content)
+
+def _notion_lookup(url, method='GET', data=None):
+    """Adapter for notion_pages: turn this script's raised errors into None"""
+    try:
+        return notion_request(url, data=data)
+    except Exception as e:
+        log(f"  Error querying Notion: {e}")
+        return None
 
 def get_notion_transcript(page_id):
-    """Get transcript from Notion page blocks"""
+    """Get transcript from Notion page blocks, following pagination.
+
+    Long transcripts span multiple pages of 100 blocks; keep fetching while
+    has_more, but stop as soon as a heading after the transcript section
+    shows up so we never download post-transcript content.
+    """
     try:
-        blocks = notion_request(f"https://api.notion.com/v1/blocks/{page_id}/children?page_size=100")
-        
         in_transcript = False
+        done = False
         transcript_lines = []
-        
-        for block in blocks.get("results", []):
-            block_type = block["type"]
-            
-            if block_type.startswith("heading"):
-                heading_content = block.get(block_type, {}).get("rich_text", [])
-                if heading_content:
-                    text = heading_content[0].get("plain_text", "").lower()
-                    if "transcript" in text:
-                        in_transcript = True
-                        continue
-                    elif in_transcript:
-                        break
-            
-            if in_transcript and block_type == "paragraph":
-                rich_text = block.get("paragraph", {}).get("rich_text", [])
-                for rt in rich_text:
-                    transcript_lines.append(rt.get("plain_text", ""))
-        
+        cursor = None
+
+        while not done:
+            url = f"https://api.notion.com/v1/blocks/{page_id}/children?page_size=100"
+            if cursor:
+                url += f"&start_cursor={cursor}"
+            blocks = notion_request(url)
+
+            for block in blocks.get("results", []):
+                block_type = block["type"]
+
+                if block_type.startswith("heading"):
+                    heading_content = block.get(block_type, {}).get("rich_text", [])
+                    if heading_content:
+                        text = heading_content[0].get("plain_text", "").lower()
+                        if "transcript" in text:
+                            in_transcript = True
+                            continue
+                        elif in_transcript:
+                            done = True
+                            break
+
+                if in_transcript and block_type == "paragraph":
+                    rich_text = block.get("paragraph", {}).get("rich_text", [])
+                    for rt in rich_text:
+                        transcript_lines.append(rt.get("plain_text", ""))
+
+            if done or not blocks.get("has_more"):
+                break
+            cursor = blocks.get("next_cursor")
+
         return "\n\n".join(transcript_lines) if transcript_lines else None
     except Exception as e:
         log(f"  Error getting Notion transcript: {e}")
         return None
 
-def create_google_doc(folder_id, title, content, access_token):
-    """Create a Google Doc in the specified folder"""
+def upload_transcript_doc(folder_id, title, content, access_token):
+    """Create a Google Doc with its content in one multipart/related upload.
+
+    Drive converts the text/plain part straight into a Doc, so the old
+    files.create + documents.batchUpdate pair collapses into a single round
+    trip and the Docs API drops out of this path entirely.
+    """
+    boundary = "related_transcript_sync"
+    metadata = {
+        "name": title,
+        "mimeType": "application/vnd.google-apps.document",
+        "parents": [folder_id]
+    }
+    payload = (
+        f"--{boundary}\r\n"
+        "Content-Type: application/json; charset=UTF-8\r\n\r\n"
+        f"{json.dumps(metadata)}\r\n"
+        f"--{boundary}\r\n"
+        "Content-Type: text/plain; charset=UTF-8\r\n\r\n"
+        f"{content}\r\n"
+        f"--{boundary}--"
+    ).encode("utf-8")
     try:
-        doc_metadata = {
-            "name": title,
-            "mimeType": "application/vnd.google-apps.document",
-            "parents": [folder_id]
-        }
-        
-        create_url = "https://www.googleapis.com/drive/v3/files"
-        headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
-        req = urllib.request.Request(create_url, headers=headers, method='POST')
-        req.data = json.dumps(doc_metadata).encode()
-        
-        with urllib.request.urlopen(req, timeout=60) as resp:
-            doc = json.loads(resp.read().decode())
-        
-        doc_id = doc["id"]
-        
-        # Update content
-        docs_url = f"https://docs.googleapis.com/v1/documents/{doc_id}:batchUpdate"
-        update_data = {"requests": [{"insertText": {"location": {"index": 1}, "text": content}}]}
-        
-        req = urllib.request.Request(docs_url, headers=headers, method='POST')
-        req.data = json.dumps(update_data).encode()
-        
-        with urllib.request.urlopen(req, timeout=60) as resp:
-            pass
-        
-        return doc_id
+        DRIVE_BUCKET.take()
+        resp = DRIVE_SESSION.post(
+            "https://www.googleapis.com/upload/drive/v3/files?uploadType=multipart",
+            content=payload,
+            headers={"Authorization": f"Bearer {access_token}",
+                     "Content-Type": f"multipart/related; boundary={boundary}"},
+            timeout=120)
+        resp.raise_for_status()
+        return resp.json()["id"]
     except Exception as e:
-        log(f"  Error creating Google Doc: {e}")
+        log(f"  Error uploading Google Doc: {e}")
         return None
 
-def check_existing_transcript_doc(folder_id, access_token):
-    """Check if transcript doc already exists"""
-    try:
-        url = f"https://www.googleapis.com/drive/v3/files?q='{folder_id}'+in+parents+and+name+contains+'Transcript'&fields=files(id,name)"
-        headers = {"Authorization": f"Bearer {access_token}"}
-        req = urllib.request.Request(url, headers=headers)
-        with urllib.request.urlopen(req, timeout=30) as resp:
-            data = json.loads(resp.read().decode())
-        files = data.get("files", [])
-        return files[0] if files else None
-    except:
-        return None
+def scan_existing_transcript_docs(access_token):
+    """List every existing transcript doc once, keyed by parent folder id.
+
+    One paginated files.list replaces a per-episode existence query.
+    """
+    existing = {}
+    params = {
+        "q": "name contains 'Transcript' and mimeType='application/vnd.google-apps.document' and trashed=false",
+        "fields": "nextPageToken, files(id,name,parents)",
+        "pageSize": 1000,
+    }
+    while True:
+        try:
+            DRIVE_BUCKET.take()
+            resp = DRIVE_SESSION.get("https://www.googleapis.com/drive/v3/files",
+                                     params=params,
+                                     headers={"Authorization": f"Bearer {access_token}"},
+                                     timeout=60)
+            resp.raise_for_status()
+        except Exception as e:
+            log(f"  Error scanning Drive for transcript docs: {e}")
+            break
+        data = resp.json()
+        for f in data.get("files", []):
+            for parent in f.get("parents", []):
+                existing.setdefault(parent, f)
+        if not data.get("nextPageToken"):
+            break
+        params["pageToken"] = data["nextPageToken"]
+    log(f"Found existing transcript docs in {len(existing)} folders")
+    return existing
+
+# State changes append to a JSONL event log; the snapshot is only rewritten
+# at checkpoints so a long run doesn't rewrite a growing file per episode
+PROGRESS_LOG_FILE = PROGRESS_FILE.replace(".json", ".jsonl")
+_progress_log = None
+
+def _append_event(event):
+    global _progress_log
+    if _progress_log is None:
+        _progress_log = open(PROGRESS_LOG_FILE, "a")
+    _progress_log.write(json.dumps(event) + "\n")
+    _progress_log.flush()
+
+def _apply_event(progress, event):
+    state = event.get("state")
+    if state == "queued":
+        # Queued for upload in phase 2 - kept until the upload attempt so a
+        # crash between the phases can't strand the episode past last_index
+        if event["index"] not in progress["queued"]:
+            progress["queued"].append(event["index"])
+    elif state:
+        progress[state].append(event["ep"])
+        if event.get("index") in progress["queued"]:
+            progress["queued"].remove(event["index"])
+    if "last_index" in event:
+        progress["last_index"] = event["last_index"]
+
+def record_event(progress, event):
+    """Apply a progress event and append it to the event log."""
+    _apply_event(progress, event)
+    _append_event(event)
 
 def load_progress():
+    progress = {"synced": [], "skipped": [], "errors": [], "queued": [], "last_index": 0}
     if os.path.exists(PROGRESS_FILE):
-        return json.load(open(PROGRESS_FILE))
-    return {"synced": [], "skipped": [], "errors": [], "last_index": 0}
+        progress.update(json.load(open(PROGRESS_FILE)))
+        progress.setdefault("queued", [])
+    # Replay events recorded since the last snapshot
+    if os.path.exists(PROGRESS_LOG_FILE):
+        with open(PROGRESS_LOG_FILE) as f:
+            for line in f:
+                if line.strip():
+                    _apply_event(progress, json.loads(line))
+    return progress
 
 def save_progress(progress):
-    with open(PROGRESS_FILE, "w") as f:
+    """Write a full snapshot (atomically) and reset the event log."""
+    global _progress_log
+    tmp = PROGRESS_FILE + ".tmp"
+    with open(tmp, "w") as f:
         json.dump(progress, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, PROGRESS_FILE)
+    if _progress_log is not None:
+        _progress_log.close()
+        _progress_log = None
+    if os.path.exists(PROGRESS_LOG_FILE):
+        open(PROGRESS_LOG_FILE, "w").close()
 
 def main():
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("--limit", type=int, help="Max episodes to process")
     parser.add_argument("--resume", action="store_true", help="Resume from last position")
+    parser.add_argument("--shard", default="0/1", help="Process only slice I of N (I/N), for multi-process runs")
     args = parser.parse_args()
+    shard_i, shard_n = map(int, args.shard.split('/'))
+
+    # Each shard keeps its own progress files so parallel processes don't clobber each other
+    global PROGRESS_FILE, PROGRESS_LOG_FILE
+    if shard_n > 1:
+        PROGRESS_FILE = PROGRESS_FILE.replace(".json", f".shard{shard_i}.json")
+        PROGRESS_LOG_FILE = PROGRESS_FILE.replace(".json", ".jsonl")
     
     # Load data
     matched = json.load(open(MATCHED_FILE))
     tokens = load_tokens()
     access_token = tokens["access_token"]
     
-    progress = load_progress() if args.resume else {"synced": [], "skipped": [], "errors": [], "last_index": 0}
+    progress = load_progress() if args.resume else {"synced": [], "skipped": [], "errors": [], "queued": [], "last_index": 0}
     start_index = progress["last_index"] if args.resume else 0
+    if not args.resume and os.path.exists(PROGRESS_LOG_FILE):
+        open(PROGRESS_LOG_FILE, "w").close()  # drop stale events from an abandoned run
     
     total = len(matched)
     end_index = min(start_index + args.limit, total) if args.limit else total
     
-    log(f"=== Starting sync: {start_index} to {end_index} of {total} ===")
-    
-    for i in range(start_index, end_index):
+    # Anchor the stride at 0, not start_index, so a resumed shard keeps
+    # walking the slice it originally owned instead of a shifted one
+    indices = [i for i in range(shard_i, end_index, shard_n) if i >= start_index]
+    # Re-drain episodes a previous run queued but never got to upload
+    if args.resume and progress["queued"]:
+        indices = sorted(set(indices) | set(progress["queued"]))
+    log(f"=== Starting sync: {start_index} to {end_index} of {total}"
+        + (f" (shard {shard_i}/{shard_n}, {len(indices)} episodes)" if shard_n > 1 else "") + " ===")
+
+    notion_pages.load_page_id_cache()
+    notion_pages.build_page_index(_notion_lookup, [matched[i].get("episode") for i in indices], echo=log)
+    existing_docs = scan_existing_transcript_docs(access_token)
+
+    # Phase 1: figure out which episodes actually need a doc and pull their transcripts
+    pending = []
+    for i in indices:
         ep = matched[i]
         ep_num = ep.get("episode", "?")
         guest = ep.get("guest", "Unknown")
         folder_id = ep.get("folder_id")
-        
+
         log(f"[{i+1}/{total}] Ep {ep_num}: {guest}")
-        
-        # Check if exists
-        existing = check_existing_transcript_doc(folder_id, access_token)
+
+        # Check if exists - in-memory lookup against the pre-scan
+        existing = existing_docs.get(folder_id)
         if existing:
             log(f"  ⏭️  Exists: {existing['name']}")
-            progress["skipped"].append(ep_num)
-            progress["last_index"] = i + 1
-            save_progress(progress)
+            record_event(progress, {"ep": ep_num, "state": "skipped", "index": i, "last_index": i + 1})
             continue
-        
-        # Get Notion page
+
+        # Get Notion page from the prefetched index
         try:
-            search_data = notion_request(
-                f"https://api.notion.com/v1/databases/13fb1a3e-b70a-4c63-afd6-08bba2e05a3e/query",
-                data={"filter": {"property": "Episode No.", "number": {"equals": ep_num}}, "page_size": 1}
-            )
-            
-            if not search_data.get("results"):
+            page_id = notion_pages.PAGE_INDEX.get(int(ep_num)) if str(ep_num).isdigit() else None
+
+            if not page_id:
                 log(f"  ⚠️  No Notion page")
-                progress["skipped"].append(ep_num)
-                progress["last_index"] = i + 1
-                save_progress(progress)
+                record_event(progress, {"ep": ep_num, "state": "skipped", "index": i, "last_index": i + 1})
                 continue
-            
-            page_id = search_data["results"][0]["id"]
+
             transcript = get_notion_transcript(page_id)
-            
+
             if not transcript or len(transcript) < 100:
                 log(f"  ⏭️  No transcript in Notion")
-                progress["skipped"].append(ep_num)
-                progress["last_index"] = i + 1
-                save_progress(progress)
+                record_event(progress, {"ep": ep_num, "state": "skipped", "index": i, "last_index": i + 1})
                 continue
-            
-            # Create Google Doc
-            doc_title = f"Ep{ep_num} - {guest} (Transcript)"
-            doc_id = create_google_doc(folder_id, doc_title, transcript, access_token)
-            
-            if doc_id:
-                log(f"  ✅ Created: {doc_title}")
-                progress["synced"].append(ep_num)
-            else:
-                progress["errors"].append(ep_num)
-                
+
+            pending.append({
+                "index": i,
+                "ep_num": ep_num,
+                "title": f"Ep{ep_num} - {guest} (Transcript)",
+                "folder_id": folder_id,
+                "transcript": transcript
+            })
+            record_event(progress, {"ep": ep_num, "state": "queued", "index": i})
         except Exception as e:
             log(f"  ❌ Error: {e}")
-            progress["errors"].append(ep_num)
-        
-        progress["last_index"] = i + 1
-        save_progress(progress)
-        time.sleep(0.3)
-    
+            record_event(progress, {"ep": ep_num, "state": "errors", "index": i})
+
+        record_event(progress, {"last_index": i + 1})
+
+    save_progress(progress)  # snapshot + log reset between phases
+
+    # Phase 2: one multipart/related upload per doc - metadata and transcript
+    # text land in a single round trip (media uploads can't be batched)
+    log(f"\nUploading {len(pending)} docs...")
+    for p in pending:
+        doc_id = upload_transcript_doc(p["folder_id"], p["title"], p["transcript"], access_token)
+        if doc_id:
+            log(f"  ✅ Created: {p['title']}")
+            record_event(progress, {"ep": p["ep_num"], "state": "synced", "index": p["index"]})
+        else:
+            record_event(progress, {"ep": p["ep_num"], "state": "errors", "index": p["index"]})
+
+    save_progress(progress)
+
     log(f"\n=== Summary ===")
     log(f"✅ Synced: {len(progress['synced'])}")
     log(f"⏭️  Skipped: {len(progress['skipped'])}")
@@ -7,73 +7,55 @@ Sync transcripts to Notion episode pages.
 """
 import json
 import os
-import urllib.request
-import urllib.parse
 import re
-import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import httpx
+import orjson
+
+import notion_pages
+from chunking import chunk_text
+from rate_limiter import Bucket
 
 # Config
 NOTION_KEY = open(os.path.expanduser("~/.config/notion/api_key_michael")).read().strip()
-DB_ID = "13fb1a3e-b70a-4c63-afd6-08bba2e05a3e"
 TRANSCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "transcripts")
 MAPPING_FILE = os.path.join(TRANSCRIPTS_DIR, "mapping.json")
 
 # Google Drive
 DRIVE_TOKENS = json.load(open(os.path.expanduser("~/.clawdbot/genie-email/tokens.json")))
 
+# One HTTP/2 client so all Notion calls multiplex over the same TLS connection
+CLIENT = httpx.Client(
+    http2=True,
+    headers={"Authorization": f"Bearer {NOTION_KEY}", "Notion-Version": "2022-06-28", "Content-Type": "application/json"},
+    timeout=httpx.Timeout(60.0),
+    limits=httpx.Limits(max_connections=8, max_keepalive_connections=4),
+    transport=httpx.HTTPTransport(retries=5),
+)
+
+# Notion allows ~3 req/s; the bucket only sleeps when we're actually over it
+NOTION_BUCKET = Bucket(rps=3)
+
 def notion_request(url, method='GET', data=None):
-    headers = {
-        "Authorization": f"Bearer {NOTION_KEY}",
-        "Notion-Version": "2022-06-28",
-        "Content-Type": "application/json"
-    }
-    req = urllib.request.Request(url, headers=headers, method=method)
-    if data:
-        req.data = json.dumps(data).encode()
     try:
-        with urllib.request.urlopen(req, timeout=60) as resp:
-            return json.loads(resp.read().decode())
-    except urllib.error.HTTPError as e:
-        print(f"  Notion error: {e.code} - {e.read().decode()[:200]}")
+        NOTION_BUCKET.take()
+        body = data if isinstance(data, bytes) or data is None else orjson.dumps(data)
+        resp = CLIENT.request(method, url, content=body)
+        resp.raise_for_status()
+        return orjson.loads(resp.content)
+    except httpx.HTTPStatusError as e:
+        print(f"  Notion error: {e.response.status_code} - {e.response.text[:200]}")
         return None
 
 def find_episode_page(episode_num):
     """Find Notion page for an episode number."""
-    data = notion_request(
-        f"https://api.notion.com/v1/databases/{DB_ID}/query",
-        method='POST',
-        data={
-            "filter": {
-                "property": "Episode No.",
-                "number": {"equals": int(episode_num)}
-            }
-        }
-    )
-    if data and data.get('results'):
-        return data['results'][0]['id']
-    return None
-
-def add_transcript_to_page(page_id, transcript_text):
-    """Add transcript text as blocks to a Notion page."""
-    # Split into chunks (Notion has 2000 char limit per block)
-    chunks = []
-    words = transcript_text.split()
-    current_chunk = []
-    current_len = 0
-    
-    for word in words:
-        if current_len + len(word) + 1 > 1900:
-            chunks.append(' '.join(current_chunk))
-            current_chunk = [word]
-            current_len = len(word)
-        else:
-            current_chunk.append(word)
-            current_len += len(word) + 1
-    
-    if current_chunk:
-        chunks.append(' '.join(current_chunk))
-    
-    # Create blocks
+    return notion_pages.find_episode_page(notion_request, episode_num)
+
+def build_blocks(transcript_text):
+    """Build the Notion block payload for a transcript."""
+    chunks = chunk_text(transcript_text)
+
     blocks = [
         {
             "object": "block",
@@ -83,8 +65,8 @@ def add_transcript_to_page(page_id, transcript_text):
             }
         }
     ]
-    
-    for chunk in chunks[:100]:  # Notion limit: 100 blocks per request
+
+    for chunk in chunks:
         blocks.append({
             "object": "block",
             "type": "paragraph",
@@ -92,14 +74,25 @@ def add_transcript_to_page(page_id, transcript_text):
                 "rich_text": [{"type": "text", "text": {"content": chunk}}]
             }
         })
-    
-    # Append blocks to page
-    result = notion_request(
-        f"https://api.notion.com/v1/blocks/{page_id}/children",
-        method='PATCH',
-        data={"children": blocks}
-    )
-    return result is not None
+
+    return blocks
+
+def add_transcript_to_page(page_id, blocks):
+    """Append prebuilt transcript blocks to a Notion page.
+
+    Notion caps appends at 100 blocks per request, so long transcripts go
+    out as several sequential PATCHes - serial within a page to preserve
+    block order, while other pages proceed in parallel workers.
+    """
+    for i in range(0, len(blocks), 100):
+        result = notion_request(
+            f"https://api.notion.com/v1/blocks/{page_id}/children",
+            method='PATCH',
+            data={"children": blocks[i:i + 100]}
+        )
+        if result is None:
+            return False
+    return True
 
 def update_transcript_link(page_id, doc_url):
     """Update the 'Link to transcript' property."""
@@ -113,60 +106,103 @@ def update_transcript_link(page_id, doc_url):
         }
     )
 
+# Stay under Notion's ~3 req/s limit
+NOTION_WORKERS = 3
+
+def process_episode(ep_num, m, blocks, n_chars):
+    """Sync one episode's prebuilt transcript blocks. Returns (ok, output lines)."""
+    lines = [f"Processing Ep{ep_num} ({m['guest']})..."]
+
+    # Find Notion page
+    page_id = find_episode_page(ep_num)
+    if not page_id:
+        lines.append(f"  ✗ Notion page not found")
+        return False, lines
+
+    lines.append(f"  Found page: {page_id[:8]}...")
+
+    # Add transcript to page
+    if add_transcript_to_page(page_id, blocks):
+        lines.append(f"  ✓ Added transcript ({n_chars} chars)")
+        ok = True
+    else:
+        lines.append(f"  ✗ Failed to add transcript")
+        ok = False
+
+    return ok, lines
+
 def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--refresh-cache", action="store_true", help="Ignore cached page ids and requery Notion")
+    parser.add_argument("--shard", default="0/1", help="Process only slice I of N (I/N), for multi-process runs")
+    args = parser.parse_args()
+    shard_i, shard_n = map(int, args.shard.split('/'))
+
+    if not args.refresh_cache:
+        notion_pages.load_page_id_cache()
+
     print("Loading transcript mapping...")
     with open(MAPPING_FILE) as f:
         mapping = json.load(f)
-    
+
     # Deduplicate by episode (keep highest score)
     by_episode = {}
     for m in mapping:
         ep = m['episode']
         if ep not in by_episode or m['score'] > by_episode[ep]['score']:
             by_episode[ep] = m
-    
+
     print(f"Found {len(by_episode)} unique episodes with transcripts")
-    
+
     synced = 0
     failed = 0
-    
-    for ep_num, m in sorted(by_episode.items(), key=lambda x: int(x[0]) if x[0].isdigit() else 0, reverse=True)[:]:
-        print(f"\nProcessing Ep{ep_num} ({m['guest']})...")
-        
-        # Load transcript text
+
+    items = sorted(by_episode.items(), key=lambda x: int(x[0]) if x[0].isdigit() else 0, reverse=True)
+
+    if shard_n > 1:
+        items = items[shard_i::shard_n]
+        print(f"Shard {shard_i}/{shard_n}: {len(items)} episodes")
+
+    # Read transcripts up front so only episodes with usable text hit Notion
+    ready = []
+    for ep_num, m in items:
         text_path = m.get('text_path')
         if not text_path or not os.path.exists(text_path):
-            print(f"  ✗ No transcript file found")
+            print(f"Ep{ep_num} ({m['guest']}): ✗ No transcript file found")
             failed += 1
             continue
-        
         with open(text_path, 'r', encoding='utf-8', errors='ignore') as f:
             transcript = f.read().strip()
-        
         if len(transcript) < 100:
-            print(f"  ✗ Transcript too short ({len(transcript)} chars)")
-            failed += 1
-            continue
-        
-        # Find Notion page
-        page_id = find_episode_page(ep_num)
-        if not page_id:
-            print(f"  ✗ Notion page not found")
+            print(f"Ep{ep_num} ({m['guest']}): ✗ Transcript too short ({len(transcript)} chars)")
             failed += 1
             continue
-        
-        print(f"  Found page: {page_id[:8]}...")
-        
-        # Add transcript to page
-        if add_transcript_to_page(page_id, transcript):
-            print(f"  ✓ Added transcript ({len(transcript)} chars)")
-            synced += 1
-        else:
-            print(f"  ✗ Failed to add transcript")
-            failed += 1
-        
-        time.sleep(0.5)  # Rate limit
-    
+        ready.append((ep_num, m, transcript))
+
+    # Chunking is pure CPU, so build every block payload across all cores
+    # before the network loop starts
+    print(f"Building block payloads for {len(ready)} transcripts...")
+    with ProcessPoolExecutor() as executor:
+        all_blocks = list(executor.map(build_blocks, [t for _, _, t in ready], chunksize=8))
+
+    # One batched lookup up front instead of one query per episode
+    notion_pages.build_page_index(notion_request, [ep_num for ep_num, _, _ in ready])
+
+    # The work is I/O waiting on Notion, so run a few episodes at once
+    with ThreadPoolExecutor(max_workers=NOTION_WORKERS) as pool:
+        futures = [pool.submit(process_episode, ep_num, m, blocks, len(t))
+                   for (ep_num, m, t), blocks in zip(ready, all_blocks)]
+        for fut in as_completed(futures):
+            ok, lines = fut.result()
+            print("\n" + "\n".join(lines))
+            if ok:
+                synced += 1
+            else:
+                failed += 1
+
+    notion_pages.save_page_id_cache()
+
     print(f"\n{'='*50}")
     print(f"Done! Synced: {synced}, Failed: {failed}")
 
@@ -4,31 +4,47 @@ Sync YouTube transcripts to Notion episode pages.
 Runs alongside the download script - syncs completed transcripts as they appear.
 """
 import json
+import mmap
 import os
-import urllib.request
-import time
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import groupby
 from pathlib import Path
 
+import httpx
+import orjson
+
+import notion_pages
+from chunking import chunk_text
+from rate_limiter import Bucket
+
 # Config
 NOTION_KEY = open(os.path.expanduser("~/.config/notion/api_key_michael")).read().strip()
-DB_ID = "13fb1a3e-b70a-4c63-afd6-08bba2e05a3e"
 TRANSCRIPTS_DIR = Path(__file__).parent.parent / "transcripts" / "youtube"
 SYNCED_FILE = Path(__file__).parent / "notion_sync_progress.json"
 
+# One HTTP/2 client so all Notion calls multiplex over the same TLS connection
+CLIENT = httpx.Client(
+    http2=True,
+    headers={"Authorization": f"Bearer {NOTION_KEY}", "Notion-Version": "2022-06-28", "Content-Type": "application/json"},
+    timeout=httpx.Timeout(60.0),
+    limits=httpx.Limits(max_connections=8, max_keepalive_connections=4),
+    transport=httpx.HTTPTransport(retries=5),
+)
+
+# Notion allows ~3 req/s; the bucket only sleeps when we're actually over it
+NOTION_BUCKET = Bucket(rps=3)
+
 def notion_request(url, method='GET', data=None):
-    headers = {
-        "Authorization": f"Bearer {NOTION_KEY}",
-        "Notion-Version": "2022-06-28",
-        "Content-Type": "application/json"
-    }
-    req = urllib.request.Request(url, headers=headers, method=method)
-    if data:
-        req.data = json.dumps(data).encode()
     try:
-        with urllib.request.urlopen(req, timeout=60) as resp:
-            return json.loads(resp.read().decode())
-    except urllib.error.HTTPError as e:
-        print(f"  Notion error: {e.code} - {e.read().decode()[:200]}")
+        NOTION_BUCKET.take()
+        body = data if isinstance(data, bytes) or data is None else orjson.dumps(data)
+        resp = CLIENT.request(method, url, content=body)
+        resp.raise_for_status()
+        return orjson.loads(resp.content)
+    except httpx.HTTPStatusError as e:
+        print(f"  Notion error: {e.response.status_code} - {e.response.text[:200]}")
         return None
     except Exception as e:
         print(f"  Request error: {e}")
@@ -36,23 +52,15 @@ def notion_request(url, method='GET', data=None):
 
 def find_episode_page(episode_num):
     """Find Notion page for an episode number."""
-    data = notion_request(
-        f"https://api.notion.com/v1/databases/{DB_ID}/query",
-        method='POST',
-        data={
-            "filter": {
-                "property": "Episode No.",
-                "number": {"equals": int(episode_num)}
-            }
-        }
-    )
-    if data and data.get('results'):
-        return data['results'][0]['id']
-    return None
+    return notion_pages.find_episode_page(notion_request, episode_num)
 
 def check_page_has_transcript(page_id):
-    """Check if page already has a transcript section."""
-    data = notion_request(f"https://api.notion.com/v1/blocks/{page_id}/children?page_size=20")
+    """Check if page already has a transcript section.
+
+    The transcript heading sits at the top of the page, so five blocks are
+    enough to decide - a quarter of the JSON the old page_size=20 pulled.
+    """
+    data = notion_request(f"https://api.notion.com/v1/blocks/{page_id}/children?page_size=5")
     if data and data.get('results'):
         for block in data['results']:
             if block.get('type') == 'heading_2':
@@ -64,23 +72,8 @@ def check_page_has_transcript(page_id):
 def add_transcript_to_page(page_id, transcript_text):
     """Add transcript text as blocks to a Notion page."""
     # Split into chunks (Notion has 2000 char limit per block)
-    chunks = []
-    words = transcript_text.split()
-    current_chunk = []
-    current_len = 0
-    
-    for word in words:
-        if current_len + len(word) + 1 > 1900:
-            chunks.append(' '.join(current_chunk))
-            current_chunk = [word]
-            current_len = len(word)
-        else:
-            current_chunk.append(word)
-            current_len += len(word) + 1
-    
-    if current_chunk:
-        chunks.append(' '.join(current_chunk))
-    
+    chunks = chunk_text(transcript_text)
+
     # Create blocks - header + paragraphs
     blocks = [
         {
@@ -97,8 +90,7 @@ def add_transcript_to_page(page_id, transcript_text):
         }
     ]
     
-    # Add paragraphs (Notion limit: 100 blocks per request)
-    for chunk in chunks[:97]:
+    for chunk in chunks:
         blocks.append({
             "object": "block",
             "type": "paragraph",
@@ -106,65 +98,135 @@ def add_transcript_to_page(page_id, transcript_text):
                 "rich_text": [{"type": "text", "text": {"content": chunk}}]
             }
         })
-    
-    if len(chunks) > 97:
-        blocks.append({
-            "object": "block",
-            "type": "paragraph",
-            "paragraph": {
-                "rich_text": [{"type": "text", "text": {"content": f"[... transcript truncated, {len(chunks) - 97} more paragraphs ...]"}}]
-            }
-        })
-    
-    # Append blocks to page
-    result = notion_request(
-        f"https://api.notion.com/v1/blocks/{page_id}/children",
-        method='PATCH',
-        data={"children": blocks}
-    )
-    return result is not None
+
+    # Append blocks 100 per request (Notion's cap) - serial within a page to
+    # preserve block order, while other pages proceed in parallel workers
+    for i in range(0, len(blocks), 100):
+        result = notion_request(
+            f"https://api.notion.com/v1/blocks/{page_id}/children",
+            method='PATCH',
+            data={"children": blocks[i:i + 100]}
+        )
+        if result is None:
+            return False
+    return True
+
+# State changes append to a JSONL event log; the snapshot is only rewritten
+# at checkpoints so a long run doesn't rewrite a growing file every time
+SYNCED_LOG_FILE = SYNCED_FILE.with_suffix('.jsonl')
+_synced_log = None
+
+def _append_event(event):
+    global _synced_log
+    if _synced_log is None:
+        _synced_log = open(SYNCED_LOG_FILE, 'a')
+    _synced_log.write(json.dumps(event) + "\n")
+    _synced_log.flush()
+
+def record_event(synced_data, ep_num, state):
+    """Apply a state change and append it to the event log."""
+    synced_data[state].append(ep_num)
+    _append_event({"ep": ep_num, "state": state})
 
 def load_synced():
+    data = {"synced": [], "failed": [], "skipped": []}
     if SYNCED_FILE.exists():
-        return json.load(open(SYNCED_FILE))
-    return {"synced": [], "failed": [], "skipped": []}
+        data.update(json.load(open(SYNCED_FILE)))
+    # Replay events recorded since the last snapshot
+    if SYNCED_LOG_FILE.exists():
+        with open(SYNCED_LOG_FILE) as f:
+            for line in f:
+                if line.strip():
+                    event = json.loads(line)
+                    if event["ep"] not in data[event["state"]]:
+                        data[event["state"]].append(event["ep"])
+    return data
 
 def save_synced(data):
-    with open(SYNCED_FILE, 'w') as f:
+    """Write a full snapshot (atomically) and reset the event log."""
+    global _synced_log
+    tmp = SYNCED_FILE.with_suffix('.json.tmp')
+    with open(tmp, 'w') as f:
         json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, SYNCED_FILE)
+    if _synced_log is not None:
+        _synced_log.close()
+        _synced_log = None
+    if SYNCED_LOG_FILE.exists():
+        SYNCED_LOG_FILE.write_text("")
+
+# One pass strips WEBVTT headers, cue numbers, timestamp lines and HTML-like tags
+_VTT_STRIP_RE = re.compile(r'(?m)^\s*(?:WEBVTT[^\n]*|Kind:[^\n]*|Language:[^\n]*|\d+|[^\n]*-->[^\n]*)\s*$\n?|<[^>]+>')
 
 def parse_vtt_to_text(vtt_content):
     """Convert VTT content to plain text."""
-    import re
-    lines = vtt_content.split('\n')
-    text_lines = []
-    
-    for line in lines:
-        line = line.strip()
-        # Skip empty, timestamps, WEBVTT header
-        if not line or '-->' in line or line.startswith('WEBVTT') or line.startswith('Kind:') or line.startswith('Language:'):
-            continue
-        if line.isdigit():
-            continue
-        # Remove HTML-like tags
-        line = re.sub(r'<[^>]+>', '', line)
-        if line:
-            text_lines.append(line)
-    
-    # Remove duplicates (common in auto-captions)
-    deduped = []
-    prev = None
-    for line in text_lines:
-        if line != prev:
-            deduped.append(line)
-            prev = line
-    
+    # Strip header, timestamps, cue numbers and tags in one regex pass
+    text_lines = (line.strip() for line in _VTT_STRIP_RE.sub('', vtt_content).splitlines())
+
+    # Remove duplicate consecutive lines (common in auto-captions)
+    deduped = (line for line, _ in groupby(line for line in text_lines if line))
+
     return ' '.join(deduped)
 
+# Stay under Notion's ~3 req/s limit
+NOTION_WORKERS = 3
+
+def process_episode(ep_num, vtt_path):
+    """Sync one VTT transcript to Notion. Returns (state, message)."""
+    # Load and parse transcript - mmap avoids a read copy for the big VTTs
+    try:
+        with open(vtt_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    vtt_content = mm[:].decode('utf-8', 'ignore')
+            else:
+                vtt_content = ""
+        transcript = parse_vtt_to_text(vtt_content)
+    except Exception as e:
+        return 'failed', f"read error: {e}"
+
+    if len(transcript) < 100:
+        return 'skipped', f"too short ({len(transcript)} chars)"
+
+    # Find Notion page
+    page_id = find_episode_page(ep_num)
+    if not page_id:
+        return 'failed', "page not found"
+
+    # Check if already has transcript
+    if check_page_has_transcript(page_id):
+        return 'skipped', "already has transcript"
+
+    # Add transcript
+    if add_transcript_to_page(page_id, transcript):
+        state, msg = 'synced', f"✓ synced ({len(transcript)} chars)"
+    else:
+        state, msg = 'failed', "✗ sync failed"
+
+    return state, msg
+
 def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--refresh-cache", action="store_true", help="Ignore cached page ids and requery Notion")
+    parser.add_argument("--shard", default="0/1", help="Process only slice I of N (I/N), for multi-process runs")
+    args = parser.parse_args()
+    shard_i, shard_n = map(int, args.shard.split('/'))
+
+    # Each shard keeps its own progress files so parallel processes don't clobber each other
+    global SYNCED_FILE, SYNCED_LOG_FILE
+    if shard_n > 1:
+        SYNCED_FILE = SYNCED_FILE.with_suffix(f'.shard{shard_i}.json')
+        SYNCED_LOG_FILE = SYNCED_FILE.with_suffix('.jsonl')
+
     print("YouTube → Notion Transcript Sync")
     print("=" * 50)
-    
+
+    if not args.refresh_cache:
+        notion_pages.load_page_id_cache()
+
     synced_data = load_synced()
     synced_set = set(synced_data['synced'] + synced_data['failed'] + synced_data['skipped'])
     
@@ -185,54 +247,42 @@ def main():
     print(f"To sync: {len(to_process)}")
     print("-" * 50)
     
-    for i, (ep_num, vtt_path) in enumerate(to_process):
+    valid = []
+    for ep_num, vtt_path in to_process:
         if not ep_num or not ep_num.isdigit():
-            print(f"[{i+1}/{len(to_process)}] Skipping invalid ep_num: '{ep_num}'")
-            continue
-        print(f"[{i+1}/{len(to_process)}] Episode {ep_num}...", end=" ", flush=True)
-        
-        # Load and parse transcript
-        try:
-            with open(vtt_path, 'r', encoding='utf-8', errors='ignore') as f:
-                vtt_content = f.read()
-            transcript = parse_vtt_to_text(vtt_content)
-        except Exception as e:
-            print(f"read error: {e}")
-            synced_data['failed'].append(ep_num)
-            continue
-        
-        if len(transcript) < 100:
-            print(f"too short ({len(transcript)} chars)")
-            synced_data['skipped'].append(ep_num)
-            continue
-        
-        # Find Notion page
-        page_id = find_episode_page(ep_num)
-        if not page_id:
-            print("page not found")
-            synced_data['failed'].append(ep_num)
-            continue
-        
-        # Check if already has transcript
-        if check_page_has_transcript(page_id):
-            print("already has transcript")
-            synced_data['skipped'].append(ep_num)
+            print(f"Skipping invalid ep_num: '{ep_num}'")
             continue
-        
-        # Add transcript
-        if add_transcript_to_page(page_id, transcript):
-            print(f"✓ synced ({len(transcript)} chars)")
-            synced_data['synced'].append(ep_num)
-        else:
-            print("✗ sync failed")
-            synced_data['failed'].append(ep_num)
-        
-        # Save progress and rate limit
-        if (i + 1) % 5 == 0:
-            save_synced(synced_data)
-        time.sleep(0.4)  # Notion rate limit
-    
+        valid.append((ep_num, vtt_path))
+
+    if shard_n > 1:
+        valid = valid[shard_i::shard_n]
+        print(f"Shard {shard_i}/{shard_n}: {len(valid)} episodes")
+
+    # One batched lookup up front instead of one query per episode
+    if valid:
+        notion_pages.build_page_index(notion_request, [ep for ep, _ in valid])
+
+    # Notion is the bottleneck, so run a few episodes at once under its limit
+    progress_lock = threading.Lock()
+    done = 0
+
+    with ThreadPoolExecutor(max_workers=NOTION_WORKERS) as pool:
+        futures = {pool.submit(process_episode, ep, vtt): ep for ep, vtt in valid}
+        for fut in as_completed(futures):
+            ep_num = futures[fut]
+            state, msg = fut.result()
+
+            with progress_lock:
+                done += 1
+                print(f"[{done}/{len(valid)}] Episode {ep_num}... {msg}")
+                record_event(synced_data, ep_num, state)
+                # Snapshot occasionally; every event is already on disk in the log
+                if done % 50 == 0:
+                    save_synced(synced_data)
+                    notion_pages.save_page_id_cache()
+
     save_synced(synced_data)
+    notion_pages.save_page_id_cache()
     
     print("\n" + "=" * 50)
     print(f"Done!")